@@ -1,7 +1,85 @@
+import math
 import numpy as np
-from collections import deque
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import Tuple
-from feature_extraction import FeatureExtractor
+from feature_extraction import (
+    FeatureExtractor, njit, welford_add, welford_remove, window_step, buffer_range_error, BUFFER_DTYPE, BUFFER_MAX,
+    BUFFER_STRUCT, N, HEAD, MEAN, M2, STD, IQR, MAX_DEVIATION, STATS_SIZE
+)
+
+
+@njit(cache=True)
+def detect_step(x: float, buf: np.ndarray, sorted_window: np.ndarray, counts: np.ndarray, stats: np.ndarray,
+                scores_window: np.ndarray, scores_counts: np.ndarray, scores_stats: np.ndarray,
+                z_threshold: float, iqr_factor: float):
+    """
+    Runs the whole per-sample update of the detector: updates the sliding window, scores the data point
+    against it, updates the adaptive Z-score threshold and makes the anomaly decision. While the window
+    is still filling, the data point is only added to it and is never reported as an anomaly.
+
+    `x` must already be rounded to `BUFFER_DTYPE` (see `window_step`).
+
+    Returns:
+        Tuple[bool, float, float, float]: Whether the data point is an anomaly, its maximum Z-score,
+            the IQR threshold and the updated Z-score threshold.
+    """
+    window_step(x, buf, sorted_window, counts, stats)
+
+    # Nothing is scored until the window is full
+    if counts[N] < buf.shape[0]:
+        return False, 0.0, 0.0, z_threshold
+
+    mean = float(stats[MEAN])
+    std = float(stats[STD])
+    if std == 0.0:
+        std = 1.0
+
+    # Maximum Z-score of the extracted features, rounded to the precision of the scores window
+    max_z_score = float(np.float32(stats[MAX_DEVIATION] / std))
+
+    # IQR-based threshold
+    iqr_threshold = float(stats[IQR]) * iqr_factor
+
+    # Update the scores window and its running statistics, and adjust the Z-score threshold
+    window_size = scores_window.shape[0]
+    n = int(scores_counts[N])
+    head = int(scores_counts[HEAD])
+    scores_mean = float(scores_stats[MEAN])
+    scores_m2 = float(scores_stats[M2])
+    if n == window_size:
+        n, scores_mean, scores_m2 = welford_remove(n, scores_mean, scores_m2, float(scores_window[head]))
+    n, scores_mean, scores_m2 = welford_add(n, scores_mean, scores_m2, max_z_score)
+    scores_window[head] = max_z_score
+    scores_counts[N] = n
+    scores_counts[HEAD] = (head + 1) % window_size
+    scores_stats[MEAN] = scores_mean
+    scores_stats[M2] = scores_m2
+    if n == window_size:
+        z_threshold = scores_mean + 2 * math.sqrt(scores_m2 / n)
+
+    # Anomaly detection
+    is_anomaly = max_z_score > z_threshold or abs(x - mean) > iqr_threshold
+    return is_anomaly, max_z_score, iqr_threshold, z_threshold
+
+
+@njit(cache=True)
+def detect_streams_step(xs: np.ndarray, bufs: np.ndarray, sorted_windows: np.ndarray, counts: np.ndarray,
+                        stats: np.ndarray, scores_windows: np.ndarray, scores_counts: np.ndarray,
+                        scores_stats: np.ndarray, z_thresholds: np.ndarray, iqr_factor: float,
+                        is_anomaly: np.ndarray, max_z_scores: np.ndarray, iqr_thresholds: np.ndarray):
+    """
+    Runs `detect_step` for one data point of each of several independent streams in a single call.
+
+    Each state argument holds one row per stream, so every stream's state stays contiguous, and `xs` must
+    already be rounded to `BUFFER_DTYPE`. The results
+    are written into `is_anomaly`, `max_z_scores` and `iqr_thresholds`, and `z_thresholds` is updated in place.
+    """
+    for k in range(xs.shape[0]):
+        is_anomaly[k], max_z_scores[k], iqr_thresholds[k], z_thresholds[k] = detect_step(
+            xs[k], bufs[k], sorted_windows[k], counts[k], stats[k],
+            scores_windows[k], scores_counts[k], scores_stats[k], z_thresholds[k], iqr_factor
+        )
+
 
 class AnomalyDetector:
     """Detects anomalies in a data stream using adaptive thresholding with Z-score and IQR."""
@@ -14,11 +92,27 @@ class AnomalyDetector:
             window_size (int): The size of the sliding window for feature extraction.
             initial_z_threshold (float): The initial Z-score threshold for detecting anomalies.
             iqr_factor (float): The factor to multiply with IQR to set the threshold for anomaly detection.
+
+        Raises:
+            ValueError: If `window_size` is less than 1.
         """
+        if window_size < 1:
+            raise ValueError(f"window_size must be at least 1, got {window_size}")
         self.feature_extractor = FeatureExtractor(window_size)
-        self.z_threshold = initial_z_threshold
-        self.iqr_factor = iqr_factor
-        self.scores_window = deque(maxlen=window_size)  # Store recent maximum Z-scores
+        self.initial_z_threshold = float(initial_z_threshold)
+        self.z_threshold = float(initial_z_threshold)
+        self.iqr_factor = float(iqr_factor)
+        self.window_size = window_size
+
+        # Ring buffer of recent maximum Z-scores, with its count and write index, and their running mean and M2
+        self.scores_window = np.empty(window_size, dtype=BUFFER_DTYPE)
+        self.scores_counts = np.zeros(2, dtype=np.int64)
+        self.scores_stats = np.zeros(2, dtype=np.float64)
+
+        # Compile `detect_step` now on scratch state so the first real data point is not delayed
+        FeatureExtractor(1).extract(0.0)
+        detect_step(0.0, np.empty(1, dtype=BUFFER_DTYPE), np.empty(1, dtype=BUFFER_DTYPE), np.zeros(2, dtype=np.int64),
+                    np.zeros(STATS_SIZE), np.empty(1, dtype=BUFFER_DTYPE), np.zeros(2, dtype=np.int64), np.zeros(2), 0.0, 0.0)
 
     def detect(self, data_point: float) -> Tuple[bool, float, float]:
         """
@@ -32,28 +126,182 @@ class AnomalyDetector:
                 - A boolean indicating if the data point is considered an anomaly.
                 - The maximum Z-score of the extracted features.
                 - The IQR threshold used for anomaly detection.
+            While the window is still filling, this is (False, 0.0, 0.0).
+
+        Raises:
+            ValueError: If the data point is NaN, infinite or beyond the float32 range of the window, which
+                would corrupt the running statistics of the window.
         """
-        features = self.feature_extractor.extract(data_point)
+        # Round the data point once to the precision the window stores it at; the range is checked first so
+        # that the cast can never overflow
+        if not -BUFFER_MAX <= data_point <= BUFFER_MAX:
+            raise buffer_range_error(data_point)
+        data_point, = BUFFER_STRUCT.unpack(BUFFER_STRUCT.pack(data_point))
 
-        # Calculate Z-scores for each feature
-        z_scores = [
-            (f - np.mean(self.feature_extractor.window)) / (np.std(self.feature_extractor.window) or 1)
-            for f in features
-        ]
-        max_z_score = max(abs(z) for z in z_scores)
+        fe = self.feature_extractor
+        is_anomaly, max_z_score, iqr_threshold, self.z_threshold = detect_step(
+            data_point, fe.buf, fe.sorted_window, fe.counts, fe.stats,
+            self.scores_window, self.scores_counts, self.scores_stats, self.z_threshold, self.iqr_factor
+        )
+        return is_anomaly, max_z_score, iqr_threshold
 
-        # Calculate IQR-based threshold
-        iqr = np.percentile(self.feature_extractor.window, 75) - np.percentile(self.feature_extractor.window, 25)
-        iqr_threshold = iqr * self.iqr_factor
+    def detect_batch(self, data: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Detect anomalies in a whole series at once, giving the same results as calling `detect` on a fresh
+        detector for each data point in turn.
 
-        # Update the scores window and adjust the Z-score threshold
-        self.scores_window.append(max_z_score)
-        if len(self.scores_window) == self.scores_window.maxlen:
-            self.z_threshold = np.mean(self.scores_window) + 2 * np.std(self.scores_window)
+        The sliding windows are built as a strided view of the series, so the window statistics for all
+        data points are computed by a handful of vectorized NumPy calls. The data points before the first
+        full window are not scored. The detector's streaming state is not used or modified.
 
-        # Anomaly detection
-        is_anomaly_z = max_z_score > self.z_threshold
-        is_anomaly_iqr = abs(data_point - np.mean(self.feature_extractor.window)) > iqr_threshold
+        Args:
+            data (np.ndarray): The series of data points to analyze.
 
-        is_anomaly = is_anomaly_z or is_anomaly_iqr
-        return is_anomaly, max_z_score, iqr_threshold
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: Arrays with one entry per data point:
+                - Booleans indicating if each data point is considered an anomaly.
+                - The maximum Z-score of the extracted features.
+                - The IQR threshold used for anomaly detection.
+                - The Z-score threshold used for anomaly detection.
+
+        Raises:
+            ValueError: If any data point is NaN, infinite or beyond the float32 range of the window, as
+                `detect` rejects them.
+        """
+        data = np.asarray(data, dtype=np.float64)
+        in_range = np.abs(data) <= BUFFER_MAX
+        if not in_range.all():
+            raise buffer_range_error(data[~in_range][0])
+
+        # Work on the data at the precision the streaming window buffers store it
+        data = data.astype(BUFFER_DTYPE).astype(np.float64)
+        size = len(data)
+        window_size = self.window_size
+        max_z_scores = np.zeros(size)
+        iqr_thresholds = np.zeros(size)
+        z_thresholds = np.full(size, self.initial_z_threshold)
+        is_anomaly = np.zeros(size, dtype=bool)
+
+        # Nothing is scored until the window is full
+        if size < window_size:
+            return is_anomaly, max_z_scores, iqr_thresholds, z_thresholds
+
+        windows = sliding_window_view(data, window_size)
+        full = slice(window_size - 1, None)
+        x = data[full]
+        means = windows.mean(axis=1)
+        stds = windows.std(axis=1)
+        q1, q3 = np.quantile(windows, [0.25, 0.75], axis=1)
+        iqrs = q3 - q1
+
+        # Closed-form least-squares slope against the positions 0..W-1
+        if window_size > 1:
+            x_mean = (window_size - 1) / 2
+            Sxx = window_size * (window_size ** 2 - 1) / 12
+            trends = (windows @ np.arange(window_size) - x_mean * windows.sum(axis=1)) / Sxx
+        else:
+            trends = np.zeros(len(windows))
+
+        # Largest deviation of the features from the mean, folded into one reused array, then scaled once;
+        # the moving average itself always deviates by zero, so it is skipped
+        scale = np.where(stds == 0, 1.0, stds)
+        max_deviation = np.abs(x - means)
+        for feature in (stds, (x - means) / scale, iqrs, trends):
+            np.maximum(max_deviation, np.abs(feature - means), out=max_deviation)
+        max_z_scores[full] = (max_deviation / scale).astype(BUFFER_DTYPE)
+        iqr_thresholds[full] = iqrs * self.iqr_factor
+
+        # The Z-score threshold adapts to the recent maximum Z-scores once a full window of them is seen
+        if len(windows) >= window_size:
+            score_windows = sliding_window_view(max_z_scores[full], window_size)
+            z_thresholds[2 * window_size - 2:] = score_windows.mean(axis=1) + 2 * score_windows.std(axis=1)
+
+        is_anomaly[full] = (max_z_scores[full] > z_thresholds[full]) | (np.abs(x - means) > iqr_thresholds[full])
+        return is_anomaly, max_z_scores, iqr_thresholds, z_thresholds
+
+
+class MultiStreamAnomalyDetector:
+    """
+    Detects anomalies in several independent data streams at once, with the same method as `AnomalyDetector`.
+
+    The state of all the streams is kept in 2D arrays with one row per stream, and each call to `detect`
+    updates every stream in a single compiled call instead of one Python call per stream.
+    """
+
+    def __init__(self, num_streams: int, window_size: int = 50, initial_z_threshold: float = 3, iqr_factor: float = 1.5):
+        """
+        Initialize the MultiStreamAnomalyDetector.
+
+        Args:
+            num_streams (int): The number of data streams to analyze.
+            window_size (int): The size of the sliding window for feature extraction.
+            initial_z_threshold (float): The initial Z-score threshold for detecting anomalies.
+            iqr_factor (float): The factor to multiply with IQR to set the threshold for anomaly detection.
+
+        Raises:
+            ValueError: If `window_size` is less than 1. The compiled kernel does no bounds checking, so an
+                empty window would be written past its end.
+        """
+        if window_size < 1:
+            raise ValueError(f"window_size must be at least 1, got {window_size}")
+        self.num_streams = num_streams
+        self.window_size = window_size
+        self.z_thresholds = np.full(num_streams, float(initial_z_threshold))
+        self.iqr_factor = float(iqr_factor)
+
+        # Per-stream sliding windows and their statistics (see `FeatureExtractor`)
+        self.bufs = np.empty((num_streams, window_size), dtype=BUFFER_DTYPE)
+        self.sorted_windows = np.empty((num_streams, window_size), dtype=BUFFER_DTYPE)
+        self.counts = np.zeros((num_streams, 2), dtype=np.int64)
+        self.stats = np.zeros((num_streams, STATS_SIZE), dtype=np.float64)
+
+        # Per-stream ring buffers of recent maximum Z-scores and their running statistics
+        self.scores_windows = np.empty((num_streams, window_size), dtype=BUFFER_DTYPE)
+        self.scores_counts = np.zeros((num_streams, 2), dtype=np.int64)
+        self.scores_stats = np.zeros((num_streams, 2), dtype=np.float64)
+
+        # Compile `detect_streams_step` now on scratch state so the first real call is not delayed
+        detect_streams_step(
+            np.zeros(1), np.empty((1, 1), dtype=BUFFER_DTYPE), np.empty((1, 1), dtype=BUFFER_DTYPE),
+            np.zeros((1, 2), dtype=np.int64), np.zeros((1, STATS_SIZE)), np.empty((1, 1), dtype=BUFFER_DTYPE),
+            np.zeros((1, 2), dtype=np.int64), np.zeros((1, 2)), np.zeros(1), 0.0,
+            np.empty(1, dtype=np.bool_), np.empty(1), np.empty(1)
+        )
+
+    def detect(self, data_points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Detect if the current data point of each stream is an anomaly.
+
+        Args:
+            data_points (np.ndarray): The current data point of each stream.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Arrays with one entry per stream:
+                - Booleans indicating if the data point is considered an anomaly.
+                - The maximum Z-score of the extracted features.
+                - The IQR threshold used for anomaly detection.
+
+        Raises:
+            ValueError: If `data_points` does not hold exactly one value per stream, or any of them is NaN,
+                infinite or beyond the float32 range of the windows.
+        """
+        # The compiled kernel does no bounds checking, so the shape must be right before entering it
+        data_points = np.asarray(data_points, dtype=np.float64)
+        if data_points.shape != (self.num_streams,):
+            raise ValueError(f"expected {self.num_streams} data points, got an array of shape {data_points.shape}")
+        in_range = np.abs(data_points) <= BUFFER_MAX
+        if not in_range.all():
+            raise buffer_range_error(data_points[~in_range][0])
+
+        # Round the data points once to the precision the windows store them at
+        data_points = data_points.astype(BUFFER_DTYPE).astype(np.float64)
+
+        is_anomaly = np.empty(self.num_streams, dtype=np.bool_)
+        max_z_scores = np.empty(self.num_streams)
+        iqr_thresholds = np.empty(self.num_streams)
+        detect_streams_step(
+            data_points, self.bufs, self.sorted_windows, self.counts, self.stats,
+            self.scores_windows, self.scores_counts, self.scores_stats, self.z_thresholds, self.iqr_factor,
+            is_anomaly, max_z_scores, iqr_thresholds
+        )
+        return is_anomaly, max_z_scores, iqr_thresholds
@@ -1,37 +1,68 @@
-import random
-import math
-from typing import Iterator
+import numpy as np
+from typing import Iterator, Optional
 
 class DataStreamSimulator:
     """Simulates a data stream with seasonal patterns, drift, and occasional anomalies."""
 
-    def __init__(self, size: int = 1000, drift_rate: float = 0.01):
+    def __init__(self, size: int = 1000, drift_rate: float = 0.01, seed: Optional[int] = None, chunk_size: int = 256):
         """
         Initialize the DataStreamSimulator.
 
         Args:
             size (int): The number of data points to generate.
             drift_rate (float): The rate at which the base value drifts over time.
+            seed (Optional[int]): The seed for the random number generator. On a fresh simulator, a given seed
+                always gives the same stream, whether it is read with `generate` or `generate_array` and
+                whatever the chunk size.
+            chunk_size (int): The number of data points `generate` produces at a time.
         """
         self.size = size
         self.drift_rate = drift_rate
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(seed)
 
-    def generate(self) -> Iterator[float]:
+        # One child generator per random component, each drawing one double per data point, so drawing
+        # the stream in chunks consumes every generator exactly as drawing it all at once does
+        self._noise_rng, self._anomaly_rng, self._sign_rng, self._magnitude_rng = self.rng.spawn(4)
+
+    def _generate_chunk(self, start: int, stop: int) -> np.ndarray:
         """
-        Generate a stream of data points.
+        Generate the data points from index `start` up to (but not including) `stop`.
 
-        Yields:
-            float: The next data point in the stream.
+        Returns:
+            np.ndarray: The data points, in order.
         """
+        size = stop - start
+        i = np.arange(start, stop)
         base_value = 50
-        for i in range(self.size):
-            seasonal_component = 10 * math.sin(i * 0.05) # Adds a sinusoidal component to simulate seasonal variations.
-            drift_component = i * self.drift_rate # Adds a linear drift over time.
-            noise = random.uniform(-3, 3) # Adds random noise between -3 and 3 to the data.
-            value = base_value + seasonal_component + drift_component + noise
+        seasonal_component = 10 * np.sin(i * 0.05) # Adds a sinusoidal component to simulate seasonal variations.
+        drift_component = i * self.drift_rate # Adds a linear drift over time.
+        noise = self._noise_rng.uniform(-3, 3, size) # Adds random noise between -3 and 3 to the data.
+        values = base_value + seasonal_component + drift_component + noise
 
-            # Introduce occasional anomalies
-            if random.random() < 0.01:  #With a 1% probability, an anomaly is added to the value.
-                value += random.choice([-1, 1]) * random.uniform(20, 30)
+        # Introduce occasional anomalies
+        mask = self._anomaly_rng.random(size) < 0.01 #With a 1% probability, an anomaly is added to the value.
+        sign = np.where(self._sign_rng.random(size) < 0.5, -1, 1)
+        magnitude = self._magnitude_rng.uniform(20, 30, size)
+        values[mask] += sign[mask] * magnitude[mask]
 
-            yield value
\ No newline at end of file
+        return values
+
+    def generate_array(self) -> np.ndarray:
+        """
+        Generate all the data points of the stream at once.
+
+        Returns:
+            np.ndarray: The data points of the stream, in order.
+        """
+        return self._generate_chunk(0, self.size)
+
+    def generate(self) -> Iterator[float]:
+        """
+        Generate a stream of data points, producing them in chunks of `chunk_size` at a time.
+
+        Yields:
+            float: The next data point in the stream.
+        """
+        for start in range(0, self.size, self.chunk_size):
+            yield from self._generate_chunk(start, min(start + self.chunk_size, self.size)).tolist()
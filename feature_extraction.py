@@ -1,12 +1,152 @@
 import numpy as np
-from collections import deque
-from typing import Tuple, List
+from typing import Tuple
 import random
 import math
+import struct
 from typing import Iterator
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional: without it the kernels below run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Element type of the window buffers; the running statistics are accumulated in float64
+BUFFER_DTYPE = np.float32
+
+# Largest magnitude the window buffers can store; beyond it a data point would be stored as infinity
+BUFFER_MAX = float(np.finfo(BUFFER_DTYPE).max)
+
+# Packs a float into the binary layout of `BUFFER_DTYPE`; a pack/unpack round trip rounds a data point
+# to the buffer precision exactly like a NumPy cast, without creating a NumPy scalar
+BUFFER_STRUCT = struct.Struct(np.dtype(BUFFER_DTYPE).char)
+
+# Positions in the `counts` state array
+N, HEAD = 0, 1
+
+# Positions in the `stats` state array
+MEAN, M2, SXY, STD, IQR, TREND, MAX_DEVIATION = range(7)
+STATS_SIZE = 7
+
+
+def buffer_range_error(x: float) -> ValueError:
+    """Returns the error for a data point the window buffers cannot store: NaN, infinite or beyond float32 range."""
+    if math.isnan(x) or math.isinf(x):
+        return ValueError(f"data point must be finite, got {x}")
+    return ValueError(f"data point {x} is out of float32 range (magnitude above {BUFFER_MAX:g})")
+
+
+@njit(cache=True)
+def welford_add(n: int, mean: float, m2: float, x: float):
+    """Returns the count, mean and M2 of a window after adding `x` to it (Welford's online algorithm)."""
+    delta = x - mean
+    n += 1
+    mean += delta / n
+    m2 = max(m2 + delta * (x - mean), 0.0)  # Guard against rounding below zero
+    return n, mean, m2
+
+
+@njit(cache=True)
+def welford_remove(n: int, mean: float, m2: float, x: float):
+    """Returns the count, mean and M2 of a window after removing `x` from it (Welford's online algorithm)."""
+    if n == 1:
+        return 0, 0.0, 0.0
+    new_mean = mean + (mean - x) / (n - 1)
+    m2 -= (x - mean) * (x - new_mean)
+    return n - 1, new_mean, m2
+
+
+@njit(cache=True)
+def quantile(sorted_window: np.ndarray, n: int, q: float) -> float:
+    """
+    Returns the q-th quantile of the first `n` values of an ascending array, using the same linear
+    interpolation between neighbouring order statistics as `np.percentile`.
+    """
+    position = q * (n - 1)
+    lower = int(position)
+    upper = min(lower + 1, n - 1)
+    low = float(sorted_window[lower])
+    return low + (float(sorted_window[upper]) - low) * (position - lower)
+
+
+@njit(cache=True)
+def window_step(x: float, buf: np.ndarray, sorted_window: np.ndarray, counts: np.ndarray, stats: np.ndarray):
+    """
+    Adds a data point to the sliding window and updates its statistics in place, in O(1) apart from
+    shifting the sorted window.
+
+    The oldest data point is evicted from the ring buffer once it is full. The mean and M2 are kept with
+    Welford's online algorithm, Sxy (the position-weighted sum) gives the trend in closed form, and the
+    sorted window gives the quartiles without sorting. The largest absolute deviation of the extracted
+    features from the mean is folded in directly, so scoring needs no intermediate list of features.
+
+    `x` must already be rounded to `BUFFER_DTYPE`, as the public entry points do, so that it is added to
+    the running statistics with exactly the value that will later be evicted from the buffer.
+    """
+    # Work on plain Python scalars (no-ops when compiled), so the uncompiled fallback does not pay for
+    # NumPy scalar arithmetic
+    window_size = buf.shape[0]
+    n = int(counts[N])
+    head = int(counts[HEAD])
+    mean = float(stats[MEAN])
+    m2 = float(stats[M2])
+    sxy = float(stats[SXY])
+
+    if n == window_size:
+        # Remove the data point being overwritten
+        old = float(buf[head])
+        n, mean, m2 = welford_remove(n, mean, m2, old)
+        # The remaining points each move one position towards the start of the window
+        sxy -= mean * n
+        i = np.searchsorted(sorted_window[:n + 1], old)
+        sorted_window[i:n] = sorted_window[i + 1:n + 1]
+
+    # Add the new data point, which takes the last position in the window
+    sxy += n * x
+    i = np.searchsorted(sorted_window[:n], x, side='right')
+    sorted_window[i + 1:n + 1] = sorted_window[i:n]
+    sorted_window[i] = x
+    n, mean, m2 = welford_add(n, mean, m2, x)
+
+    buf[head] = x
+    counts[N] = n
+    counts[HEAD] = (head + 1) % window_size
+    stats[MEAN] = mean
+    stats[M2] = m2
+    stats[SXY] = sxy
+
+    # The derived features are only meaningful once the window is full
+    if n < window_size:
+        return
+
+    std = math.sqrt(m2 / n)
+    iqr = quantile(sorted_window, n, 0.75) - quantile(sorted_window, n, 0.25)
+    stats[STD] = std
+    stats[IQR] = iqr
+
+    # Least-squares slope against the positions 0..W-1: (Sxy - x_mean * Sy) / sum((x - x_mean)^2)
+    trend = 0.0
+    if window_size > 1:
+        x_mean = (window_size - 1) / 2
+        trend = (sxy - x_mean * mean * n) / (window_size * (window_size ** 2 - 1) / 12)
+    stats[TREND] = trend
+
+    # Largest deviation of the features from the mean; the moving average itself always deviates by zero,
+    # so it is skipped
+    scale = std if std != 0.0 else 1.0
+    max_deviation = abs(x - mean)
+    max_deviation = max(max_deviation, abs(std - mean))
+    max_deviation = max(max_deviation, abs((x - mean) / scale - mean))
+    max_deviation = max(max_deviation, abs(iqr - mean))
+    max_deviation = max(max_deviation, abs(trend - mean))
+    stats[MAX_DEVIATION] = max_deviation
+
+
 class FeatureExtractor:
     """
     A class used to extract features from a stream of data points for anomaly detection.
@@ -17,16 +157,43 @@ class FeatureExtractor:
 
     Attributes:
     -----------
-    window : deque
-        A deque object that holds the most recent data points up to the specified window size. 
-        It automatically discards the oldest data point when a new one is added after reaching its max length.
+    buf : np.ndarray
+        A preallocated float32 ring buffer that holds the most recent data points up to the specified window
+        size. The oldest data point is overwritten in place when a new one is added after the buffer is full.
+
+    sorted_window : np.ndarray
+        The data points in the window kept in ascending order, used to read quantiles without sorting.
+
+    counts : np.ndarray
+        The number of data points in the window and the index of the slot in `buf` that the next data
+        point will be written to.
+
+    stats : np.ndarray
+        The running mean, M2 (sum of squared deviations) and Sxy (position-weighted sum) of the window,
+        followed by the standard deviation, IQR, trend and largest feature deviation derived from them
+        (only computed once the window is full).
+
+    features : np.ndarray
+        A preallocated array that `extract` fills with the features of the current data point.
+
+    n : int
+        The number of data points currently held in the window.
+
+    last_mean : float
+        The mean of the window as of the most recent call to `extract`.
+
+    last_std : float
+        The standard deviation of the window as of the most recent call to `extract` (0 until the window is full).
+
+    last_iqr : float
+        The interquartile range of the window as of the most recent call to `extract` (0 until the window is full).
 
     Methods:
     --------
     __init__(window_size: int):
         Initializes the FeatureExtractor with a specific window size.
         
-    extract(x: float) -> List[float]:
+    extract(x: float) -> np.ndarray:
         Appends the current data point to the window and extracts key features such as the moving average,
         standard deviation, Z-score, interquartile range (IQR), and trend (slope).
     """
@@ -39,11 +206,55 @@ class FeatureExtractor:
             window_size (int): The number of past data points to consider for feature extraction.
                                This size determines how many data points will be used to calculate the
                                statistical features.
+
+        Raises:
+            ValueError: If `window_size` is less than 1. The compiled kernels do no bounds checking, so an empty
+                window would be written past its end.
         """
-        # Initialize a deque with a fixed size to store recent data points
-        self.window = deque(maxlen=window_size)
+        if window_size < 1:
+            raise ValueError(f"window_size must be at least 1, got {window_size}")
+        self.window_size = window_size
 
-    def extract(self, x: float) -> List[float]:
+        # Preallocated ring buffer to store recent data points, and a sorted copy for the quartiles
+        self.buf = np.empty(window_size, dtype=BUFFER_DTYPE)
+        self.sorted_window = np.empty(window_size, dtype=BUFFER_DTYPE)
+
+        # State updated in place by `window_step`
+        self.counts = np.zeros(2, dtype=np.int64)
+        self.stats = np.zeros(STATS_SIZE, dtype=np.float64)
+
+        # Reused output of `extract`
+        self.features = np.empty(6, dtype=np.float64)
+
+    @property
+    def n(self) -> int:
+        """The number of data points currently held in the window."""
+        return int(self.counts[N])
+
+    @property
+    def last_mean(self) -> float:
+        """The mean of the window as of the most recent call to `extract`."""
+        return float(self.stats[MEAN])
+
+    @property
+    def last_std(self) -> float:
+        """The standard deviation of the window as of the most recent call to `extract` (0 until the window is full)."""
+        return float(self.stats[STD])
+
+    @property
+    def last_iqr(self) -> float:
+        """The interquartile range of the window as of the most recent call to `extract` (0 until the window is full)."""
+        return float(self.stats[IQR])
+
+    @property
+    def window(self) -> np.ndarray:
+        """The data points in the window, ordered from oldest to newest."""
+        n, head = self.counts
+        if n < self.window_size:
+            return self.buf[:n]
+        return np.concatenate((self.buf[head:], self.buf[:head]))
+
+    def extract(self, x: float) -> np.ndarray:
         """
         Extracts statistical features from the current data point and the recent data in the sliding window.
 
@@ -51,26 +262,42 @@ class FeatureExtractor:
         data point. If the window is not yet full (i.e., has fewer points than `window_size`), the raw value 
         is returned. Once the window is full, it computes the following features:
         
-        1. **Current Value**: The raw value of the current data point.
+        1. **Current Value**: The raw value of the current data point (rounded to the float32 window precision).
         2. **Moving Average**: The mean of the data points in the window.
         3. **Standard Deviation**: A measure of how spread out the data points in the window are.
         4. **Z-Score**: The number of standard deviations the current value is from the mean.
         5. **Interquartile Range (IQR)**: The range between the 75th percentile (Q3) and 25th percentile (Q1), used to detect outliers.
         6. **Trend (Slope)**: The slope of the linear trend in the data points, indicating whether the data shows an increasing, decreasing, or stable trend.
+
+        The features are written into the preallocated `features` array, which is returned (as a length-1 view
+        while the window is filling). It is overwritten by the next call, so copy it to keep the values.
+
+        Raises:
+            ValueError: If `x` is NaN, infinite or beyond the float32 range of the window, which would corrupt
+                the running statistics of the window.
         """
-        # Add the current data point to the sliding window
-        self.window.append(x)
+        # Round the data point once to the precision the window stores it at, so the features match the
+        # statistics; the range is checked first so that the cast can never overflow
+        if not -BUFFER_MAX <= x <= BUFFER_MAX:
+            raise buffer_range_error(x)
+        x, = BUFFER_STRUCT.unpack(BUFFER_STRUCT.pack(x))
+
+        # Add the current data point to the sliding window and update its statistics
+        window_step(x, self.buf, self.sorted_window, self.counts, self.stats)
+
+        features = self.features
+        features[0] = x
 
         # If the window is not full, return the raw value of the current data point
-        if len(self.window) < self.window.maxlen:
-            return [x]
+        if self.counts[N] < self.window_size:
+            return features[:1]
 
         # Extract the key statistical features once the window is full
-        return [
-            x,  # Current data point (raw value)
-            np.mean(self.window),  # Moving average of the window
-            np.std(self.window),  # Standard deviation of the window
-            (x - np.mean(self.window)) / (np.std(self.window) or 1),  # Z-score: Standardized measure of how far `x` is from the mean
-            np.percentile(self.window, 75) - np.percentile(self.window, 25),  # IQR: Difference between the 75th and 25th percentiles (Q3 - Q1)
-            np.polyfit(range(len(self.window)), self.window, 1)[0]  # Trend (Slope): Linear trend over the window using linear regression
-        ]
+        stats = self.stats
+        mean, std = float(stats[MEAN]), float(stats[STD])
+        features[1] = mean  # Moving average of the window
+        features[2] = std  # Standard deviation of the window
+        features[3] = (x - mean) / (std or 1)  # Z-score: Standardized measure of how far `x` is from the mean
+        features[4] = stats[IQR]  # IQR: Difference between the 75th and 25th percentiles (Q3 - Q1)
+        features[5] = stats[TREND]  # Trend (Slope): Linear trend over the window using linear regression
+        return features
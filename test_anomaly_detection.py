@@ -0,0 +1,160 @@
+import unittest
+import warnings
+from collections import deque
+import numpy as np
+from data_stream import DataStreamSimulator
+from feature_extraction import FeatureExtractor
+from anomaly_detection import AnomalyDetector, MultiStreamAnomalyDetector
+
+
+def reference_detect(data: np.ndarray, window_size: int, initial_z_threshold: float = 3, iqr_factor: float = 1.5):
+    """Straightforward float64 version of `AnomalyDetector.detect`, recomputing every statistic from the window."""
+    window = deque(maxlen=window_size)
+    scores_window = deque(maxlen=window_size)
+    z_threshold = initial_z_threshold
+    results = []
+    for x in data:
+        window.append(x)
+        if len(window) < window_size:
+            results.append((False, 0.0, 0.0))
+            continue
+        mean = np.mean(window)
+        std = np.std(window) or 1
+        iqr = np.percentile(window, 75) - np.percentile(window, 25)
+        trend = np.polyfit(range(window_size), window, 1)[0]
+        features = [x, mean, np.std(window), (x - mean) / std, iqr, trend]
+        max_z_score = max(abs(f - mean) / std for f in features)
+        iqr_threshold = iqr * iqr_factor
+        scores_window.append(max_z_score)
+        if len(scores_window) == window_size:
+            z_threshold = np.mean(scores_window) + 2 * np.std(scores_window)
+        is_anomaly = max_z_score > z_threshold or abs(x - mean) > iqr_threshold
+        results.append((is_anomaly, max_z_score, iqr_threshold))
+    return results
+
+
+class TestDataStreamSimulator(unittest.TestCase):
+    def test_seed_defines_one_stream(self):
+        expected = DataStreamSimulator(size=1000, seed=3).generate_array()
+        for chunk_size in (1, 7, 256, 5000):
+            streamed = np.fromiter(DataStreamSimulator(size=1000, seed=3, chunk_size=chunk_size).generate(), dtype=float)
+            np.testing.assert_array_equal(streamed, expected)
+        self.assertFalse(np.array_equal(DataStreamSimulator(size=1000, seed=4).generate_array(), expected))
+
+
+class TestFeatureExtractor(unittest.TestCase):
+    def setUp(self):
+        self.data = DataStreamSimulator(size=1000, seed=0).generate_array()
+
+    def test_matches_float64_reference(self):
+        window_size = 50
+        fe = FeatureExtractor(window_size)
+        for i, x in enumerate(self.data):
+            features = fe.extract(x)
+            if i < window_size - 1:
+                self.assertEqual(len(features), 1)
+                continue
+            window = self.data[i - window_size + 1:i + 1]
+            mean, std = np.mean(window), np.std(window)
+            expected = [
+                x,
+                mean,
+                std,
+                (x - mean) / std,
+                np.percentile(window, 75) - np.percentile(window, 25),
+                np.polyfit(range(window_size), window, 1)[0],
+            ]
+            np.testing.assert_allclose(features, expected, rtol=1e-5, atol=1e-4)
+
+    def test_rejects_non_finite(self):
+        fe = FeatureExtractor(5)
+        for bad in (np.nan, np.inf, -np.inf):
+            with self.assertRaisesRegex(ValueError, "finite"):
+                fe.extract(bad)
+        self.assertEqual(fe.n, 0)
+
+    def test_rejects_out_of_float32_range_without_overflow(self):
+        fe = FeatureExtractor(5)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            for bad in (1e39, -1e39, np.float64(1e39)):
+                with self.assertRaisesRegex(ValueError, "out of float32 range"):
+                    fe.extract(bad)
+        self.assertEqual(fe.n, 0)
+
+    def test_rejects_empty_window(self):
+        for window_size in (0, -1):
+            with self.assertRaises(ValueError):
+                FeatureExtractor(window_size)
+
+
+class TestAnomalyDetector(unittest.TestCase):
+    def setUp(self):
+        self.data = DataStreamSimulator(size=2000, seed=1).generate_array()
+
+    def test_matches_float64_reference(self):
+        for window_size in (50, 7):
+            detector = AnomalyDetector(window_size)
+            results = [detector.detect(x) for x in self.data]
+            expected = reference_detect(self.data, window_size)
+            self.assertEqual([r[0] for r in results], [e[0] for e in expected])
+            np.testing.assert_allclose([r[1:] for r in results], [e[1:] for e in expected], rtol=1e-4, atol=1e-4)
+
+    def test_detect_batch_matches_detect(self):
+        for window_size in (50, 7, 2, 1):
+            for size in (0, window_size - 1, window_size, 2 * window_size - 2, len(self.data)):
+                data = self.data[:size]
+                detector = AnomalyDetector(window_size)
+                streamed = []
+                for x in data:
+                    streamed.append((*detector.detect(x), detector.z_threshold))
+                streamed = np.array(streamed, dtype=float).reshape(-1, 4)
+                batch = np.column_stack(AnomalyDetector(window_size).detect_batch(data)).astype(float).reshape(-1, 4)
+                np.testing.assert_array_equal(batch[:, 0], streamed[:, 0])
+                np.testing.assert_allclose(batch[:, 1:], streamed[:, 1:], rtol=1e-6, atol=1e-9)
+
+    def test_rejects_non_finite(self):
+        detector = AnomalyDetector(5)
+        with self.assertRaises(ValueError):
+            detector.detect(np.nan)
+        with self.assertRaises(ValueError):
+            detector.detect_batch([1.0, np.inf])
+
+    def test_rejects_out_of_float32_range_without_overflow(self):
+        detector = AnomalyDetector(5)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            with self.assertRaisesRegex(ValueError, "out of float32 range"):
+                detector.detect(1e39)
+            with self.assertRaisesRegex(ValueError, "out of float32 range"):
+                detector.detect_batch([1.0, -1e39])
+
+    def test_rejects_empty_window(self):
+        with self.assertRaises(ValueError):
+            AnomalyDetector(0)
+
+
+class TestMultiStreamAnomalyDetector(unittest.TestCase):
+    def test_matches_single_stream(self):
+        streams = np.stack([DataStreamSimulator(size=500, seed=seed).generate_array() for seed in range(4)])
+        multi = MultiStreamAnomalyDetector(len(streams), 20)
+        results = [multi.detect(streams[:, t]) for t in range(streams.shape[1])]
+        for k, stream in enumerate(streams):
+            detector = AnomalyDetector(20)
+            expected = np.array([detector.detect(x) for x in stream], dtype=float)
+            actual = np.array([[r[0][k], r[1][k], r[2][k]] for r in results], dtype=float)
+            np.testing.assert_array_equal(actual, expected)
+
+    def test_rejects_empty_window(self):
+        with self.assertRaises(ValueError):
+            MultiStreamAnomalyDetector(2, 0)
+
+    def test_rejects_wrong_shape_or_non_finite(self):
+        multi = MultiStreamAnomalyDetector(2, 5)
+        for bad in (np.arange(6.0), np.arange(1.0), np.ones((1, 2)), [1.0, np.nan], [1.0, 1e39]):
+            with self.assertRaises(ValueError):
+                multi.detect(bad)
+
+
+if __name__ == "__main__":
+    unittest.main()
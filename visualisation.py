@@ -16,61 +16,50 @@ class AnomalyVisualizer:
             initial_z_threshold (float): The initial Z-score threshold for anomaly detection.
             iqr_factor (float): The factor to multiply with IQR to set the threshold for anomaly detection.
         """
-        # Initialize a data stream simulator to generate data points
-        self.data_stream = DataStreamSimulator(size=1000).generate()
+        # Initialize a data stream simulator and materialize its data points
+        self.size = 1000
+        self.data = DataStreamSimulator(size=self.size).generate_array()
         
         # Initialize the anomaly detector with specified parameters
         self.detector = AnomalyDetector(window_size, initial_z_threshold, iqr_factor)
+
+        # Run the detection over the whole stream up front so each frame only has to draw
+        self.is_anomaly, self.max_z_scores, self.iqr_thresholds, self.z_thresholds = self.detector.detect_batch(self.data)
         
-        # Lists to store data points, anomalies, anomaly scores, and indices for plotting
-        self.data_points = []
-        self.anomalies = []
-        self.scores = []
-        self.indices = []
+        # Preallocated plot data: the x values, the scatter offsets of the anomalies only, and the number
+        # of anomalies up to each frame
+        self.indices = np.arange(self.size)
+        self.anomaly_offsets = np.column_stack((self.indices[self.is_anomaly], self.data[self.is_anomaly]))
+        self.anomaly_counts = np.cumsum(self.is_anomaly)
 
     def update(self, frame: int):
         """
         Update the visualization with the next data point.
 
         Args:
-            frame (int): The current frame number (unused, required by FuncAnimation).
+            frame (int): The current frame number, used as the index of the data point to show.
 
         Returns:
             tuple: Updated plot elements.
         """
-        # Get the next data point from the data stream
-        data_point = next(self.data_stream)
-        
-        # Detect if the new data point is an anomaly and get the anomaly score
-        is_anomaly, score, iqr_threshold = self.detector.detect(data_point)
-
-        # Append the new data point, score, index, and anomaly status to the lists
-        self.data_points.append(data_point)
-        self.scores.append(score)
-        self.indices.append(frame)
-        self.anomalies.append(data_point if is_anomaly else None)
+        # Look up the precomputed thresholds for this data point
+        iqr_threshold = self.iqr_thresholds[frame]
+        z_threshold = self.z_thresholds[frame]
+        shown = slice(0, frame + 1)
+        indices = self.indices[shown]
 
         # Update the data for the line plot of data points
-        self.line1.set_data(self.indices, self.data_points)
+        self.line1.set_data(indices, self.data[shown])
         
         # Update the scatter plot for anomalies
-        self.scatter1.set_offsets(np.c_[self.indices, self.anomalies])
+        self.scatter1.set_offsets(self.anomaly_offsets[:self.anomaly_counts[frame]])
         
         # Update the data for the line plot of anomaly scores
-        self.line2.set_data(self.indices, self.scores)
+        self.line2.set_data(indices, self.max_z_scores[shown])
         
-        # Update the line plot for the Z-score threshold
-        self.threshold_line.set_data(self.indices, [self.detector.z_threshold] * len(self.indices))
-
-        # Update the line plot for the IQR threshold if indices are available
-        if len(self.indices) > 0:
-            self.iqr_threshold_line.set_data(self.indices, [iqr_threshold] * len(self.indices))
-
-        # Rescale the axes to fit the updated data
-        self.ax1.relim()
-        self.ax1.autoscale_view()
-        self.ax2.relim()
-        self.ax2.autoscale_view()
+        # Update the Z-score and IQR threshold lines, which are flat so only need their two endpoints
+        self.threshold_line.set_data((0, frame), (z_threshold, z_threshold))
+        self.iqr_threshold_line.set_data((0, frame), (iqr_threshold, iqr_threshold))
 
         # Return the updated plot elements
         return self.line1, self.scatter1, self.line2, self.threshold_line, self.iqr_threshold_line
@@ -92,6 +81,12 @@ class AnomalyVisualizer:
         self.threshold_line, = self.ax2.plot([], [], lw=2, color='crimson', linestyle='--', label='Z-score Threshold', zorder=1)
         self.iqr_threshold_line, = self.ax2.plot([], [], lw=2, color='darkorange', linestyle='--', label='IQR Threshold', zorder=1)
 
+        # Fix the axis limits from the precomputed data so they don't need rescaling every frame
+        self.ax1.set_xlim(0, self.size)
+        self.ax1.set_ylim(*self._padded_limits(self.data))
+        self.ax2.set_xlim(0, self.size)
+        self.ax2.set_ylim(*self._padded_limits(np.concatenate((self.max_z_scores, self.z_thresholds, self.iqr_thresholds))))
+
         # Plot settings
         self.ax1.set_title('Real-Time Data Stream and Anomalies', fontsize=14)
         self.ax1.set_xlabel('Index', fontsize=12)
@@ -104,12 +99,19 @@ class AnomalyVisualizer:
         self.ax2.legend()
 
         # Create an animation object that calls the `update` method at each frame
-        ani = FuncAnimation(fig, self.update, frames=range(1000), init_func=self.init, blit=True, interval=50)
+        ani = FuncAnimation(fig, self.update, frames=range(self.size), init_func=self.init, blit=True, interval=50)
         
         # Adjust layout to fit the plots and display
         plt.tight_layout()
         plt.show()
 
+    @staticmethod
+    def _padded_limits(values: np.ndarray, margin: float = 0.05):
+        """Return axis limits spanning the given values with a relative margin on both sides."""
+        low, high = np.min(values), np.max(values)
+        pad = (high - low) * margin or 1
+        return low - pad, high + pad
+
     def init(self):
         """Initialize the plot elements."""
         # Return the initial plot elements to be used by FuncAnimation